@@ -1,17 +1,27 @@
 # audio_analyzer.py - Audio Emotion Analysis Module
 from typing import Dict, List, Optional, Any
 import logging
-from datetime import datetime
+from bisect import bisect_right
+from functools import lru_cache
+from math import gcd
 import os
 import numpy as np
 import librosa
 import soundfile as sf
+from numba import njit
+from scipy.signal import firwin, resample_poly
 from pydub import AudioSegment
 import io
-import tempfile
+import struct
+import threading
 from dotenv import load_dotenv
-from huggingface_hub import InferenceClient
+from huggingface_hub import InferenceClient, configure_http_backend
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
+from result_cache import ResultCache, content_digest
+from clock import now_iso
 
 load_dotenv()
 
@@ -23,92 +33,226 @@ HF_TOKEN = os.getenv("HF_TOKEN")
 AUDIO_MODEL = "firdhokk/speech-emotion-recognition-with-openai-whisper-large-v3"
 SAMPLE_RATE = 16000
 MAX_DURATION = 30  # seconds
+FFMPEG_FORMATS = frozenset({"mp3", "m4a"})  # not decodable by libsndfile; decoded via pydub
+AUDIO_CACHE_SIZE = int(os.getenv("AUDIO_CACHE_SIZE", "128"))  # cached results keyed by upload hash
+HF_RETRY_COOLDOWN = float(os.getenv("HF_RETRY_COOLDOWN", "30"))  # seconds to skip the API after a failure
+
+# Risk weights for emotions
+EMOTION_RISK_WEIGHTS = {
+    "sad": 60,
+    "fearful": 70,
+    "angry": 50,
+    "disgust": 40,
+    "neutral": 25,
+    "calm": 15,
+    "happy": 10,
+    "surprised": 20
+}
+DEFAULT_RISK_WEIGHT = 30
+
+# Risk level boundaries, scanned with bisect
+RISK_THRESHOLDS = (35, 55, 75)
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
+# Next step shown for each risk level
+NEXT_STEPS = {
+    "LOW": "Continue self-care practices and monitor your wellbeing",
+    "MEDIUM": "Consider professional consultation for additional support",
+    "HIGH": "Urgently seek professional mental health support",
+    "CRITICAL": "Immediate intervention required - contact emergency services"
+}
+
+# Fallback heuristic: prior scores plus feature-driven shifts, one slot per label
+FALLBACK_EMOTIONS = ("neutral", "calm", "happy", "sad", "angry", "fearful", "disgust", "surprised")
+FALLBACK_PRIOR = np.array([0.3, 0.2, 0.1, 0.1, 0.1, 0.1, 0.05, 0.05])
+HIGH_ENERGY_SHIFT = np.array([0.0, 0.0, 0.0, 0.0, 0.2, 0.1, 0.0, 0.0])    # angry, fearful
+LOW_ENERGY_SHIFT = np.array([0.0, 0.2, 0.0, 0.1, 0.0, 0.0, 0.0, 0.0])     # calm, sad
+BRIGHT_SPECTRUM_SHIFT = np.array([0.0, 0.0, 0.15, 0.0, 0.0, 0.0, 0.0, 0.1])  # happy, surprised
+DARK_SPECTRUM_SHIFT = np.array([0.0, 0.0, 0.0, 0.15, 0.0, 0.0, 0.0, 0.0])    # sad
+
+@njit(fastmath=True, cache=True)
+def _mean_energy(audio: np.ndarray) -> float:
+    """Mean squared amplitude in one pass, without a squared temporary"""
+    n = audio.shape[0]
+    if n == 0:
+        return 0.0
+    total = 0.0
+    for i in range(n):
+        total += audio[i] * audio[i]
+    return total / n
+
+def _hf_session_factory() -> requests.Session:
+    """Keep-alive session with a pooled adapter so HF API calls reuse TLS connections"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(total=2, backoff_factor=0.1)
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# RIFF/WAVE header for mono 16-bit PCM
+WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+
+@lru_cache(maxsize=32)
+def _wav_header(data_size: int, sample_rate: int) -> bytes:
+    """44-byte WAV header, reused for clips of the same length"""
+    return WAV_HEADER.pack(
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b'data', data_size
+    )
+
+@lru_cache(maxsize=16)
+def _resample_plan(orig_sr: int, target_sr: int) -> tuple:
+    """Reduced up/down factors and the anti-aliasing FIR resample_poly would design"""
+    g = gcd(orig_sr, target_sr)
+    up, down = target_sr // g, orig_sr // g
+    max_rate = max(up, down)
+    taps = firwin(20 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0)).astype(np.float32)
+    return up, down, taps
 
 class AudioProcessor:
     """Handle audio file processing"""
     
     @staticmethod
-    def convert_to_wav(audio_bytes: bytes, input_format: str) -> bytes:
-        """Convert any audio format to WAV"""
+    def decode_with_ffmpeg(audio_bytes: bytes, input_format: str) -> tuple:
+        """Decode formats libsndfile can't read via pydub/ffmpeg, straight to mono float32 samples"""
         try:
             audio = AudioSegment.from_file(io.BytesIO(audio_bytes), format=input_format)
-            wav_buffer = io.BytesIO()
-            audio.export(wav_buffer, format="wav")
-            return wav_buffer.getvalue()
+            
+            # Normalize to signed 16-bit so 8-bit (unsigned) and 24-bit sources read correctly
+            audio = audio.set_sample_width(2)
+            samples = np.frombuffer(audio.raw_data, dtype='<i2')
+            
+            # Same full-scale mapping soundfile applies when reading PCM as float32
+            samples = samples.astype(np.float32) * (1.0 / 32768)
+            if audio.channels > 1:
+                samples = samples.reshape(-1, audio.channels).mean(axis=1)
+            
+            return np.ascontiguousarray(samples, dtype=np.float32), audio.frame_rate
         except Exception as e:
             raise ValueError(f"Audio conversion failed: {str(e)}")
     
     @staticmethod
-    def load_audio(audio_bytes: bytes, target_sr: int = 16000) -> tuple:
-        """Load audio bytes and convert to numpy array"""
+    def resample(audio: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+        """Polyphase resampling (much cheaper than librosa's default soxr_hq)"""
+        if orig_sr == target_sr:
+            return audio
+        up, down, taps = _resample_plan(orig_sr, target_sr)
+        return resample_poly(audio.astype(np.float32, copy=False), up, down, window=taps)
+    
+    @staticmethod
+    def to_wav_bytes(audio: np.ndarray, sample_rate: int) -> bytes:
+        """Frame mono audio as 16-bit PCM WAV with a hand-built 44-byte header"""
+        scaled = np.clip(audio, -1.0, 1.0)
+        scaled *= 32767
+        pcm = np.rint(scaled, out=scaled).astype('<i2').tobytes()
+        return _wav_header(len(pcm), sample_rate) + pcm
+    
+    @staticmethod
+    def load_audio(audio_bytes: bytes, target_sr: Optional[int] = 16000) -> tuple:
+        """Load audio bytes and convert to numpy array (target_sr=None keeps the native rate)"""
         try:
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp:
-                tmp.write(audio_bytes)
-                tmp_path = tmp.name
+            audio, sr = sf.read(io.BytesIO(audio_bytes), dtype='float32', always_2d=False)
             
-            audio, sr = librosa.load(tmp_path, sr=target_sr, duration=MAX_DURATION)
-            os.unlink(tmp_path)
+            # Downmix to mono
+            if audio.ndim > 1:
+                audio = audio.mean(axis=1)
             
-            return audio, sr
+            if target_sr and sr != target_sr:
+                audio = AudioProcessor.resample(audio, sr, target_sr)
+                sr = target_sr
+            
+            # Everything downstream (resampling, WAV framing, numba kernels) works on one contiguous float32 buffer
+            return np.ascontiguousarray(audio, dtype=np.float32), sr
         except Exception as e:
             raise ValueError(f"Audio loading failed: {str(e)}")
     
     @staticmethod
-    def validate_audio(audio_bytes: bytes) -> dict:
-        """Validate audio file"""
+    def validate_audio(audio_array: np.ndarray, sample_rate: int) -> dict:
+        """Validate decoded audio"""
+        duration = len(audio_array) / sample_rate if sample_rate else 0
         validation = {
             "valid": False,
             "error": None,
-            "duration": 0,
-            "sample_rate": 0
+            "duration": duration,
+            "sample_rate": sample_rate
         }
         
-        try:
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp:
-                tmp.write(audio_bytes)
-                tmp_path = tmp.name
-            
-            info = sf.info(tmp_path)
-            validation["duration"] = info.duration
-            validation["sample_rate"] = info.samplerate
-            
-            if info.duration > MAX_DURATION:
-                validation["error"] = f"Audio too long. Max: {MAX_DURATION}s"
-            elif info.duration < 1:
-                validation["error"] = "Audio too short. Min: 1s"
-            else:
-                validation["valid"] = True
-            
-            os.unlink(tmp_path)
-        except Exception as e:
-            validation["error"] = f"Validation failed: {str(e)}"
+        if duration > MAX_DURATION:
+            validation["error"] = f"Audio too long. Max: {MAX_DURATION}s"
+        elif duration < 1:
+            validation["error"] = "Audio too short. Min: 1s"
+        else:
+            validation["valid"] = True
         
         return validation
 
 class AudioEmotionAnalyzer:
     """Audio emotion analyzer using Hugging Face models"""
     
+    # Emergency resources (shared by every response)
+    EMERGENCY_HELPLINES = {
+        "Vandrevala Foundation": "9999666555",
+        "iCall": "+91-9152987821",
+        "AASRA": "91-9820466726",
+        "SNEHA": "044-24640050",
+        "National Mental Health Helpline": "08046110007"
+    }
+    
+    # Risk phrases by level (no transcript here; text input is scanned by text_analyzer's automaton)
+    RISK_PATTERNS = {
+        "CRITICAL": ("suicide", "kill myself", "end my life", "want to die"),
+        "HIGH": ("hopeless", "worthless", "self harm", "no future"),
+        "MEDIUM": ("depressed", "anxious", "stressed", "lonely"),
+        "LOW": ("sad", "worried", "tired", "frustrated")
+    }
+    
+    # Baseline recommendations per risk level
+    BASE_RECOMMENDATIONS = {
+        "LOW": (
+            "Continue monitoring your emotional wellbeing",
+            "Practice relaxation techniques when needed",
+            "Maintain healthy sleep and exercise habits"
+        ),
+        "MEDIUM": (
+            "Consider speaking with a counselor or therapist",
+            "Practice stress management techniques regularly",
+            "Reach out to supportive friends or family"
+        ),
+        "HIGH": (
+            "Seek professional mental health support soon",
+            "Create a safety plan with trusted contacts",
+            "Avoid isolation and stay connected with others"
+        ),
+        "CRITICAL": (
+            "🚨 Contact a crisis helpline immediately",
+            "🚨 Seek emergency mental health services",
+            "🚨 Do not stay alone - reach out to someone now"
+        )
+    }
+    
+    # Extra recommendation for emotions that call for one
+    EMOTION_RECOMMENDATIONS = {
+        "sad": "Engage in activities that uplift your mood",
+        "fearful": "Engage in activities that uplift your mood",
+        "angry": "Practice anger management techniques"
+    }
+    
     def __init__(self, hf_token: str = None):
         self.hf_token = hf_token or HF_TOKEN
         self.initialized = False
         self.audio_processor = AudioProcessor()
+        self.result_cache = ResultCache(maxsize=AUDIO_CACHE_SIZE)
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._api_retry_at = 0.0
         
-        # Risk patterns
-        self.RISK_PATTERNS = {
-            "CRITICAL": ["suicide", "kill myself", "end my life", "want to die"],
-            "HIGH": ["hopeless", "worthless", "self harm", "no future"],
-            "MEDIUM": ["depressed", "anxious", "stressed", "lonely"],
-            "LOW": ["sad", "worried", "tired", "frustrated"]
-        }
-        
-        # Emergency resources
-        self.EMERGENCY_HELPLINES = {
-            "Vandrevala Foundation": "9999666555",
-            "iCall": "+91-9152987821",
-            "AASRA": "91-9820466726",
-            "SNEHA": "044-24640050",
-            "National Mental Health Helpline": "08046110007"
-        }
+        # Only a few dozen (risk level, emotion) pairs ever occur
+        self._recommendations_for = lru_cache(maxsize=64)(self._build_recommendations)
         
         self._initialize_models()
     
@@ -118,6 +262,8 @@ class AudioEmotionAnalyzer:
             logger.info(f"Initializing audio model: {AUDIO_MODEL}")
             
             if self.hf_token:
+                # huggingface_hub caches one session per thread from this factory
+                configure_http_backend(backend_factory=_hf_session_factory)
                 self.client = InferenceClient(token=self.hf_token, timeout=60)
                 logger.info("Using Hugging Face Inference API")
                 self.use_inference_api = True
@@ -125,6 +271,9 @@ class AudioEmotionAnalyzer:
                 logger.warning("No HF_TOKEN found, using fallback analysis")
                 self.use_inference_api = False
             
+            # Compile the fallback kernel now so the first request doesn't pay the JIT cost
+            _mean_energy(np.zeros(1, dtype=np.float32))
+            
             self.initialized = True
             logger.info("Audio analyzer initialized successfully")
             
@@ -137,40 +286,39 @@ class AudioEmotionAnalyzer:
         try:
             # Resample if needed
             if sample_rate != SAMPLE_RATE:
-                audio_array = librosa.resample(audio_array, orig_sr=sample_rate, target_sr=SAMPLE_RATE)
+                audio_array = self.audio_processor.resample(audio_array, sample_rate, SAMPLE_RATE)
             
-            # Convert to bytes for API
-            buffer = io.BytesIO()
-            sf.write(buffer, audio_array, SAMPLE_RATE, format='WAV')
-            audio_bytes = buffer.getvalue()
-            
-            if self.use_inference_api and hasattr(self, 'client'):
+            # After an API failure, go straight to the fallback until the cooldown expires
+            # (analyze_audio_file doesn't cache those answers, so the clips get the model once it's back)
+            if self.use_inference_api and hasattr(self, 'client') and time.monotonic() >= self._api_retry_at:
                 # Use Hugging Face Inference API
                 try:
+                    audio_bytes = self.audio_processor.to_wav_bytes(audio_array, SAMPLE_RATE)
                     result = self.client.audio_classification(
                         audio_bytes,
                         model=AUDIO_MODEL
                     )
                     
                     if result:
-                        # Parse results
+                        # Parse results, tracking the primary emotion in the same pass
                         emotions = {}
+                        primary_emotion, confidence = "neutral", None
                         for item in result:
                             emotion = item.get('label', '').lower()
-                            score = item.get('score', 0.0)
-                            emotions[emotion] = float(score)
-                        
-                        # Get primary emotion
-                        primary_emotion = max(emotions.items(), key=lambda x: x[1])[0] if emotions else "neutral"
+                            score = float(item.get('score', 0.0))
+                            emotions[emotion] = score
+                            if confidence is None or score > confidence:
+                                primary_emotion, confidence = emotion, score
                         
                         return {
                             "primary_emotion": primary_emotion,
                             "emotion_scores": emotions,
-                            "confidence": emotions.get(primary_emotion, 0.5),
+                            "confidence": confidence if confidence is not None else 0.5,
                             "method": "hugging_face_api"
                         }
                 except Exception as e:
                     logger.warning(f"HF API failed: {str(e)}, using fallback")
+                    self._api_retry_at = time.monotonic() + HF_RETRY_COOLDOWN
             
             # Fallback analysis
             return self._fallback_emotion_analysis(audio_array)
@@ -182,48 +330,24 @@ class AudioEmotionAnalyzer:
     def _fallback_emotion_analysis(self, audio_array: np.ndarray) -> Dict[str, Any]:
         """Fallback emotion analysis using audio features"""
         try:
-            # Extract audio features
-            mfcc = librosa.feature.mfcc(y=audio_array, sr=SAMPLE_RATE, n_mfcc=13)
-            spectral_centroid = librosa.feature.spectral_centroid(y=audio_array, sr=SAMPLE_RATE)
-            zero_crossing_rate = librosa.feature.zero_crossing_rate(audio_array)
+            # Extract the features the heuristic actually scores: spectral centroid and energy
+            # (kept at the full 16 kHz rate so the 2 kHz centroid threshold means the same thing)
+            magnitude = np.abs(librosa.stft(audio_array))
+            spectral_centroid = librosa.feature.spectral_centroid(S=magnitude, sr=SAMPLE_RATE)
             
             # Calculate statistics
-            mfcc_mean = np.mean(mfcc)
             spectral_mean = np.mean(spectral_centroid)
-            zcr_mean = np.mean(zero_crossing_rate)
-            energy = np.sum(audio_array ** 2) / len(audio_array)
-            
-            # Simple heuristic-based emotion detection
-            emotions = {
-                "neutral": 0.3,
-                "calm": 0.2,
-                "happy": 0.1,
-                "sad": 0.1,
-                "angry": 0.1,
-                "fearful": 0.1,
-                "disgust": 0.05,
-                "surprised": 0.05
-            }
-            
-            # Adjust based on features
-            if energy > 0.01:
-                emotions["angry"] += 0.2
-                emotions["fearful"] += 0.1
-            else:
-                emotions["calm"] += 0.2
-                emotions["sad"] += 0.1
+            energy = _mean_energy(audio_array.astype(np.float32, copy=False))
             
-            if spectral_mean > 2000:
-                emotions["happy"] += 0.15
-                emotions["surprised"] += 0.1
-            else:
-                emotions["sad"] += 0.15
+            # Simple heuristic-based emotion detection, adjusted by features
+            scores = FALLBACK_PRIOR + (HIGH_ENERGY_SHIFT if energy > 0.01 else LOW_ENERGY_SHIFT)
+            scores += BRIGHT_SPECTRUM_SHIFT if spectral_mean > 2000 else DARK_SPECTRUM_SHIFT
             
             # Normalize
-            total = sum(emotions.values())
-            emotions = {k: v/total for k, v in emotions.items()}
+            scores *= 1.0 / scores.sum()
             
-            primary_emotion = max(emotions.items(), key=lambda x: x[1])[0]
+            primary_emotion = FALLBACK_EMOTIONS[int(scores.argmax())]
+            emotions = dict(zip(FALLBACK_EMOTIONS, scores.tolist()))
             
             return {
                 "primary_emotion": primary_emotion,
@@ -243,87 +367,71 @@ class AudioEmotionAnalyzer:
     
     def calculate_risk_score(self, emotion_scores: Dict[str, float]) -> tuple:
         """Calculate risk score from emotion scores"""
-        # Risk weights for emotions
-        risk_weights = {
-            "sad": 60,
-            "fearful": 70,
-            "angry": 50,
-            "disgust": 40,
-            "neutral": 25,
-            "calm": 15,
-            "happy": 10,
-            "surprised": 20
-        }
-        
         risk_score = 0
         for emotion, score in emotion_scores.items():
-            weight = risk_weights.get(emotion, 30)
-            risk_score += weight * score
+            risk_score += EMOTION_RISK_WEIGHTS.get(emotion, DEFAULT_RISK_WEIGHT) * score
         
-        # Determine risk level
-        if risk_score >= 75:
-            risk_level = "CRITICAL"
-        elif risk_score >= 55:
-            risk_level = "HIGH"
-        elif risk_score >= 35:
-            risk_level = "MEDIUM"
-        else:
-            risk_level = "LOW"
+        risk_level = RISK_LEVELS[bisect_right(RISK_THRESHOLDS, risk_score)]
         
         return risk_level, risk_score
     
     def get_recommendations(self, risk_level: str, primary_emotion: str) -> List[str]:
         """Get recommendations based on risk level and emotion"""
-        base_recommendations = {
-            "LOW": [
-                "Continue monitoring your emotional wellbeing",
-                "Practice relaxation techniques when needed",
-                "Maintain healthy sleep and exercise habits"
-            ],
-            "MEDIUM": [
-                "Consider speaking with a counselor or therapist",
-                "Practice stress management techniques regularly",
-                "Reach out to supportive friends or family"
-            ],
-            "HIGH": [
-                "Seek professional mental health support soon",
-                "Create a safety plan with trusted contacts",
-                "Avoid isolation and stay connected with others"
-            ],
-            "CRITICAL": [
-                "🚨 Contact a crisis helpline immediately",
-                "🚨 Seek emergency mental health services",
-                "🚨 Do not stay alone - reach out to someone now"
-            ]
-        }
-        
-        recommendations = base_recommendations.get(risk_level, base_recommendations["MEDIUM"]).copy()
+        return list(self._recommendations_for(risk_level, primary_emotion))
+    
+    def _build_recommendations(self, risk_level: str, primary_emotion: str) -> tuple:
+        """Base recommendations for the risk level plus any emotion-specific one, capped at three"""
+        recommendations = self.BASE_RECOMMENDATIONS.get(risk_level, self.BASE_RECOMMENDATIONS["MEDIUM"])
         
         # Add emotion-specific recommendations
-        if primary_emotion in ["sad", "fearful"]:
-            recommendations.append("Engage in activities that uplift your mood")
-        elif primary_emotion == "angry":
-            recommendations.append("Practice anger management techniques")
+        emotion_recommendation = self.EMOTION_RECOMMENDATIONS.get(primary_emotion)
+        if emotion_recommendation:
+            recommendations += (emotion_recommendation,)
         
         return recommendations[:3]
     
     def analyze_audio_file(self, audio_bytes: bytes, file_format: str) -> Dict[str, Any]:
         """Main method to analyze audio file"""
-        start_time = time.time()
+        start_time = time.perf_counter()
+        
+        # Identical re-submissions skip decoding and inference entirely
+        cache_key = (content_digest(audio_bytes), file_format)
+        cached = self.result_cache.get(cache_key)
+        owner = False
+        if cached is None:
+            # Concurrent uploads of the same clip wait for one analysis instead of each calling the model;
+            # the owner hands its result (or error) over directly, so this works with the cache disabled too
+            with self._inflight_lock:
+                pending = self._inflight.get(cache_key)
+                if pending is None:
+                    pending = {"done": threading.Event(), "result": None, "error": None}
+                    self._inflight[cache_key] = pending
+                    owner = True
+            if not owner:
+                pending["done"].wait()
+                if pending["error"] is not None:
+                    raise Exception(pending["error"])
+                cached = pending["result"]
+        if cached is not None:
+            return {
+                **cached,
+                "analysis_timestamp": now_iso(),
+                "processing_time": round(time.perf_counter() - start_time, 2)
+            }
         
         try:
+            # Decode once at the native rate; resampling happens in analyze_emotion
+            # (wav/flac/ogg are read by soundfile, the rest by ffmpeg without a WAV re-encode)
+            if file_format in FFMPEG_FORMATS:
+                audio_array, sample_rate = self.audio_processor.decode_with_ffmpeg(audio_bytes, file_format)
+            else:
+                audio_array, sample_rate = self.audio_processor.load_audio(audio_bytes, target_sr=None)
+            
             # Validate audio
-            validation = self.audio_processor.validate_audio(audio_bytes)
+            validation = self.audio_processor.validate_audio(audio_array, sample_rate)
             if not validation["valid"]:
                 raise ValueError(validation["error"])
             
-            # Convert to WAV if needed
-            if file_format != "wav":
-                audio_bytes = self.audio_processor.convert_to_wav(audio_bytes, file_format)
-            
-            # Load audio
-            audio_array, sample_rate = self.audio_processor.load_audio(audio_bytes)
-            
             # Analyze emotion
             emotion_result = self.analyze_emotion(audio_array, sample_rate)
             
@@ -333,22 +441,14 @@ class AudioEmotionAnalyzer:
             # Get recommendations
             recommendations = self.get_recommendations(risk_level, emotion_result["primary_emotion"])
             
-            # Determine next step
-            next_steps = {
-                "LOW": "Continue self-care practices and monitor your wellbeing",
-                "MEDIUM": "Consider professional consultation for additional support",
-                "HIGH": "Urgently seek professional mental health support",
-                "CRITICAL": "Immediate intervention required - contact emergency services"
-            }
-            
             # Prepare warning flags
             warning_flags = []
             if risk_level in ["HIGH", "CRITICAL"]:
                 warning_flags.append(f"Detected {risk_level} risk level from audio analysis")
             
-            processing_time = time.time() - start_time
+            processing_time = time.perf_counter() - start_time
             
-            return {
+            result = {
                 "success": True,
                 "risk_level": risk_level,
                 "risk_score": round(risk_score, 2),
@@ -361,13 +461,25 @@ class AudioEmotionAnalyzer:
                 "format": file_format,
                 "recommendations": recommendations,
                 "warning_flags": warning_flags,
-                "next_step": next_steps[risk_level],
+                "next_step": NEXT_STEPS[risk_level],
                 "emergency_helplines": self.EMERGENCY_HELPLINES,
-                "analysis_timestamp": datetime.now().isoformat(),
+                "analysis_timestamp": now_iso(),
                 "model_used": AUDIO_MODEL if emotion_result["method"] == "hugging_face_api" else "Fallback Analysis",
                 "processing_time": round(processing_time, 2)
             }
+            # Only cache model answers; a fallback from a transient API failure would otherwise stick
+            if emotion_result["method"] == "hugging_face_api" or not self.use_inference_api:
+                self.result_cache.put(cache_key, result)
+            pending["result"] = result
+            
+            # Callers annotate the top-level dict, so hand out a copy
+            return dict(result)
             
         except Exception as e:
             logger.error(f"Audio analysis failed: {str(e)}")
-            raise Exception(f"Audio analysis error: {str(e)}")
+            pending["error"] = f"Audio analysis error: {str(e)}"
+            raise Exception(pending["error"])
+        finally:
+            if owner:
+                with self._inflight_lock:
+                    self._inflight.pop(cache_key)["done"].set()
@@ -0,0 +1,17 @@
+# clock.py - Cheap ISO timestamps for API responses
+import time
+from datetime import datetime
+
+# (epoch second, formatted string) of the last timestamp handed out
+_last_timestamp = (0, "")
+
+
+def now_iso() -> str:
+    """Current local time as an ISO string, formatted at most once per second"""
+    global _last_timestamp
+    second = int(time.time())
+    cached_second, formatted = _last_timestamp
+    if cached_second != second:
+        formatted = datetime.fromtimestamp(second).isoformat()
+        _last_timestamp = (second, formatted)
+    return formatted
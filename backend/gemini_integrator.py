@@ -2,21 +2,62 @@
 import os
 import logging
 from typing import Dict, List, Optional, Any
-from datetime import datetime
 from dotenv import load_dotenv
 import google.generativeai as genai
 import json
 
+from clock import now_iso
+from result_cache import ResultCache
+
+try:
+    from orjson import loads as json_loads  # raises a json.JSONDecodeError subclass
+except ImportError:
+    json_loads = json.loads
+
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Configuration
+GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_CACHE_SIZE = int(os.getenv("GEMINI_CACHE_SIZE", "2048"))  # responses kept per prompt (0 disables)
+GEMINI_CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", "3600"))  # seconds before a prompt is sent again
+
+# Static part of the prompt, sent once as the model's system instruction
+SYSTEM_INSTRUCTION = """You are a compassionate mental health AI assistant analyzing a person's emotional state based on multiple data sources.
+
+Based on the analysis summary you are given, provide:
+
+1. **Top 3 Personalized Recommendations** (practical, actionable, empathetic)
+2. **Personalized Advice** (2-3 paragraphs of compassionate guidance considering their specific situation)
+
+Guidelines:
+- Be empathetic and supportive
+- Provide specific, actionable advice
+- Consider the severity of the overall risk level
+- If HIGH or CRITICAL risk, emphasize professional help
+- Be culturally sensitive
+- Avoid medical diagnosis
+- Keep recommendations practical and achievable
+"""
+
+# JSON mode: the API returns a body matching this schema, no markdown to strip
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "recommendations": {"type": "array", "items": {"type": "string"}},
+        "personalized_advice": {"type": "string"}
+    },
+    "required": ["recommendations", "personalized_advice"]
+}
+
 class GeminiIntegrator:
     """Integrates with Google Gemini API for personalized mental health recommendations"""
     
     def __init__(self):
         self.initialized = False
+        self.response_cache = ResultCache(maxsize=GEMINI_CACHE_SIZE, ttl=GEMINI_CACHE_TTL)
         self.gemini_api_key = os.getenv("GEMINI_API_KEY")
         
         if not self.gemini_api_key:
@@ -28,7 +69,14 @@ class GeminiIntegrator:
             genai.configure(api_key=self.gemini_api_key)
             
             # Initialize model
-            self.model = genai.GenerativeModel('gemini-2.5.flash')
+            self.model = genai.GenerativeModel(
+                GEMINI_MODEL,
+                system_instruction=SYSTEM_INSTRUCTION,
+                generation_config=genai.GenerationConfig(
+                    response_mime_type="application/json",
+                    response_schema=RESPONSE_SCHEMA
+                )
+            )
             
             self.initialized = True
             logger.info("Gemini AI Integrator initialized successfully")
@@ -66,67 +114,45 @@ class GeminiIntegrator:
                 combined_emotions
             )
             
-            # Create prompt
-            prompt = f"""You are a compassionate mental health AI assistant analyzing a person's emotional state based on multiple data sources.
-
-ANALYSIS SUMMARY:
+            # Only the per-request context; the instructions live in the system instruction
+            prompt = f"""ANALYSIS SUMMARY:
 {context}
 
-Based on this comprehensive analysis, provide:
-
-1. **Top 3 Personalized Recommendations** (practical, actionable, empathetic)
-2. **Personalized Advice** (2-3 paragraphs of compassionate guidance considering their specific situation)
-
-Guidelines:
-- Be empathetic and supportive
-- Provide specific, actionable advice
-- Consider the severity ({overall_risk_level} risk)
-- If HIGH or CRITICAL risk, emphasize professional help
-- Be culturally sensitive
-- Avoid medical diagnosis
-- Keep recommendations practical and achievable
-
-Format your response as JSON:
-{{
-  "recommendations": ["recommendation 1", "recommendation 2", "recommendation 3"],
-  "personalized_advice": "Your detailed personalized advice here..."
-}}
+Severity: {overall_risk_level} risk
 """
             
+            # The prompt holds everything the answer depends on, so repeat summaries reuse it
+            cached = self.response_cache.get(prompt)
+            if cached is not None:
+                logger.info("Using cached Gemini recommendations")
+                return {**cached, "recommendations": list(cached["recommendations"]), "timestamp": now_iso()}
+            
             logger.info("Sending request to Gemini API...")
             
             # Generate response
             response = self.model.generate_content(prompt)
             
             # Parse response
-            response_text = response.text.strip()
-            
-            # Try to extract JSON from response
             try:
-                # Remove markdown code blocks if present
-                if "```json" in response_text:
-                    response_text = response_text.split("```json")[1].split("```")[0].strip()
-                elif "```" in response_text:
-                    response_text = response_text.split("```")[1].split("```")[0].strip()
-                
-                result = json.loads(response_text)
-                
-                recommendations = result.get("recommendations", [])[:3]
-                personalized_advice = result.get("personalized_advice", "")
-                
-                logger.info("Successfully generated Gemini recommendations")
-                
-                return {
-                    "recommendations": recommendations,
-                    "personalized_advice": personalized_advice,
-                    "source": "Google Gemini AI",
-                    "timestamp": datetime.now().isoformat()
-                }
-                
+                result = json_loads(response.text)
             except json.JSONDecodeError:
-                # Fallback parsing
-                logger.warning("Failed to parse JSON from Gemini, using text parsing")
-                return self._parse_text_response(response_text, overall_risk_level)
+                logger.warning("Gemini returned malformed JSON, using fallback recommendations")
+                return self._get_fallback_response(overall_risk_level)
+            
+            recommendations = result.get("recommendations", [])[:3]
+            personalized_advice = result.get("personalized_advice", "")
+            
+            logger.info("Successfully generated Gemini recommendations")
+            
+            result = {
+                "recommendations": recommendations,
+                "personalized_advice": personalized_advice,
+                "source": "Google Gemini AI",
+                "timestamp": now_iso()
+            }
+            self.response_cache.put(prompt, result)
+            
+            return {**result, "recommendations": list(recommendations)}
             
         except Exception as e:
             logger.error(f"Gemini API error: {str(e)}")
@@ -178,51 +204,6 @@ Format your response as JSON:
         
         return "\n".join(context_parts)
     
-    def _parse_text_response(self, response_text: str, risk_level: str) -> Dict[str, Any]:
-        """Parse text response when JSON parsing fails"""
-        
-        recommendations = []
-        personalized_advice = ""
-        
-        lines = response_text.split('\n')
-        in_recommendations = False
-        in_advice = False
-        
-        for line in lines:
-            line = line.strip()
-            
-            if 'recommendation' in line.lower() and ':' not in line:
-                in_recommendations = True
-                in_advice = False
-                continue
-            
-            if 'advice' in line.lower() or 'guidance' in line.lower():
-                in_recommendations = False
-                in_advice = True
-                continue
-            
-            if in_recommendations and line and len(recommendations) < 3:
-                # Clean up line
-                rec = line.lstrip('123456789.-*• ')
-                if len(rec) > 15:
-                    recommendations.append(rec)
-            
-            if in_advice and line:
-                personalized_advice += line + " "
-        
-        if not recommendations:
-            recommendations = self._get_fallback_recommendations(risk_level)
-        
-        if not personalized_advice:
-            personalized_advice = self._get_fallback_advice(risk_level)
-        
-        return {
-            "recommendations": recommendations[:3],
-            "personalized_advice": personalized_advice.strip(),
-            "source": "Google Gemini AI (parsed)",
-            "timestamp": datetime.now().isoformat()
-        }
-    
     def _get_fallback_response(self, risk_level: str) -> Dict[str, Any]:
         """Fallback response when Gemini is unavailable"""
         
@@ -230,7 +211,7 @@ Format your response as JSON:
             "recommendations": self._get_fallback_recommendations(risk_level),
             "personalized_advice": self._get_fallback_advice(risk_level),
             "source": "Fallback System",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         }
     
     def _get_fallback_recommendations(self, risk_level: str) -> List[str]:
@@ -0,0 +1,16 @@
+# gunicorn.conf.py - Production server settings (Linux/Mac)
+# Run with: gunicorn -c gunicorn.conf.py main:app
+import multiprocessing
+import os
+
+# Bind address (same variables as the .env Optional Configuration block)
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '8000')}"
+
+# Each worker loads its own copy of the models, so keep the count modest
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, multiprocessing.cpu_count()))))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Video and combined analysis can take a while on CPU
+timeout = 120
+graceful_timeout = 30
+keepalive = 30
@@ -1,17 +1,31 @@
 # main.py - Integrated Mental Health Analysis API
 from fastapi import FastAPI, UploadFile, File, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, ConfigDict
 from typing import Optional, List, Dict, Literal
 import logging
-from datetime import datetime
 import uvicorn
+import anyio
+import asyncio
+import hashlib
+import orjson
 import os
+import sys
+import threading
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from uuid import uuid4
 from dotenv import load_dotenv
 
+from clock import now_iso
+from result_cache import ResultCache
+
 # Import analyzers
-from text_analyzer import TextSentimentAnalyzer, TextAnalysisRequest, TextAnalysisResponse
+from text_analyzer import TextSentimentAnalyzer, TextAnalysisRequest, TextAnalysisResponse, MentalHealthResources
 from video_analyzer import VideoEmotionDetector
 from audio_analyzer import AudioEmotionAnalyzer
 from gemini_integrator import GeminiIntegrator
@@ -26,13 +40,201 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Worker threads available to blocking analyzer calls
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "64"))
+
+# Upload limits
+MAX_AUDIO_SIZE_BYTES = int(os.getenv("MAX_AUDIO_SIZE_MB", "50")) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Accepted uploads (names kept in order for error messages)
+AUDIO_FORMAT_NAMES = ("wav", "mp3", "m4a", "flac", "ogg")
+AUDIO_FORMATS = frozenset(AUDIO_FORMAT_NAMES)
+VIDEO_CONTENT_TYPE_NAMES = ("video/mp4", "video/avi", "video/mov", "video/webm", "video/x-msvideo")
+VIDEO_CONTENT_TYPES = frozenset(VIDEO_CONTENT_TYPE_NAMES)
+
+# Video results keyed by (SHA-256 of upload, frame_skip)
+VIDEO_CACHE_SIZE = int(os.getenv("VIDEO_CACHE_SIZE", "256"))
+video_cache = ResultCache(maxsize=VIDEO_CACHE_SIZE)
+
+# The shared detector's MediaPipe graphs are not thread-safe
+video_lock = threading.Lock()
+
+# Emergency resources included in every combined response
+EMERGENCY_RESOURCES = {
+    "Vandrevala Foundation": "9999666555",
+    "iCall": "+91-9152987821",
+    "AASRA": "91-9820466726",
+    "National Mental Health Helpline": "08046110007"
+}
+
+# Recommendations used when Gemini is unavailable
+FALLBACK_RECOMMENDATIONS = {
+    "LOW": (
+        "Continue practicing daily self-care activities",
+        "Maintain regular sleep schedule and healthy eating habits",
+        "Stay connected with friends and family"
+    ),
+    "MEDIUM": (
+        "Consider scheduling a consultation with a mental health professional",
+        "Practice stress-reduction techniques like meditation or deep breathing",
+        "Reach out to supportive friends or family members"
+    ),
+    "HIGH": (
+        "Urgently consult with a mental health professional",
+        "Create a safety plan with trusted contacts",
+        "Avoid isolation and stay with supportive people"
+    ),
+    "CRITICAL": (
+        "🚨 CALL A CRISIS HELPLINE IMMEDIATELY",
+        "🚨 Go to the nearest emergency department",
+        "🚨 Do not stay alone - contact a trusted person NOW"
+    )
+}
+
+# Next steps per risk level; emotion-specific steps are appended per request
+BASE_NEXT_STEPS = {
+    "LOW": (
+        "Continue monitoring your mental wellbeing",
+        "Maintain healthy lifestyle habits",
+        "Practice mindfulness or meditation regularly"
+    ),
+    "MEDIUM": (
+        "Schedule an appointment with a counselor or therapist",
+        "Explore online therapy platforms for convenient access",
+        "Join a support group or community"
+    ),
+    "HIGH": (
+        "Seek immediate professional mental health support",
+        "Inform a trusted person about your situation",
+        "Remove access to any means of self-harm"
+    ),
+    "CRITICAL": (
+        "Contact emergency services or crisis helpline NOW",
+        "Go to nearest hospital emergency department",
+        "Stay with a trusted person continuously"
+    )
+}
+ANXIETY_EMOTIONS = frozenset({"anxiety", "fear"})
+
+# Risk weights for facial emotions in video results; unknown labels count as 40
+VIDEO_EMOTION_RISKS = {
+    "sadness": 70,
+    "fear": 65,
+    "anger": 60,
+    "disgust": 50,
+    "neutral": 30,
+    "surprise": 25,
+    "happy": 15
+}
+
+# Static parts of the / and /models responses; module status is overlaid per request
+ROOT_INFO = {
+    "message": "Integrated Mental Health Analysis API",
+    "version": "3.0.0",
+    "status": "operational",
+    "endpoints": {
+        "text_analysis": "/analyze/text (POST)",
+        "audio_analysis": "/analyze/audio (POST)",
+        "video_analysis": "/analyze/video (POST)",
+        "combined_analysis": "/analyze/combined (POST)",
+        "health": "/health (GET)",
+        "models": "/models (GET)"
+    },
+    "documentation": "/docs"
+}
+MODELS_INFO = {
+    "text_models": {
+        "sentiment": "tabularisai/multilingual-sentiment-analysis",
+        "recommendations": "meta-llama/Llama-3.1-8B-Instruct:novita"
+    },
+    "audio_models": {
+        "emotion_recognition": "firdhokk/speech-emotion-recognition-with-openai-whisper-large-v3"
+    },
+    "video_models": {
+        "facial_emotion": "dima806/facial_emotions_image_detection",
+        "face_detection": "MediaPipe Face Detection"
+    },
+    "ai_integration": {
+        "final_recommendations": "Google Gemini API"
+    },
+    "python_version": "3.12.7"
+}
+
+class APIResponse(ORJSONResponse):
+    """orjson response that also serializes NumPy scalars returned by the analyzers"""
+    
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+# Global analyzer instances
+text_analyzer = None
+video_analyzer = None
+audio_analyzer = None
+gemini_integrator = None
+
+# ==================== Startup/Shutdown ====================
+def create_video_analyzer():
+    """Create the video detector and run one warm-up inference"""
+    detector = VideoEmotionDetector(use_hf_model=True)
+    if detector.warmup():
+        logger.info("✓ Facial emotion model warmed up")
+    return detector
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize all analyzers concurrently on startup and clean up on shutdown"""
+    global text_analyzer, video_analyzer, audio_analyzer, gemini_integrator
+    
+    logger.info("=" * 60)
+    logger.info("Starting Integrated Mental Health Analysis API v3.0.0")
+    logger.info("=" * 60)
+    
+    # Size the thread pool used by run_in_threadpool
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREAD_POOL_SIZE
+    
+    # Model loading is blocking, so each analyzer initializes in its own thread
+    initializers = (
+        ("Text Sentiment Analyzer", "Text Analyzer", TextSentimentAnalyzer),
+        ("Video Emotion Detector", "Video Analyzer", create_video_analyzer),
+        ("Audio Emotion Analyzer", "Audio Analyzer", AudioEmotionAnalyzer),
+        ("Gemini AI Integrator", "Gemini Integrator", GeminiIntegrator),
+    )
+    results = await asyncio.gather(
+        *(asyncio.to_thread(factory) for _, _, factory in initializers),
+        return_exceptions=True
+    )
+    
+    analyzers = []
+    for (name, short_name, _), result in zip(initializers, results):
+        if isinstance(result, Exception):
+            logger.error(f"✗ Failed to initialize {short_name}: {str(result)}")
+            analyzers.append(None)
+        else:
+            logger.info(f"✓ {name} initialized")
+            analyzers.append(result)
+    text_analyzer, video_analyzer, audio_analyzer, gemini_integrator = analyzers
+    
+    logger.info("=" * 60)
+    logger.info("API startup complete!")
+    logger.info("=" * 60)
+    
+    yield
+    
+    # Cleanup resources on shutdown
+    if video_analyzer:
+        video_analyzer.cleanup()
+    logger.info("API shutdown complete")
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Integrated Mental Health Analysis API",
     description="Unified API for text, audio, and video-based mental health analysis with AI recommendations",
     version="3.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=APIResponse,
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -44,11 +246,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global analyzer instances
-text_analyzer = None
-video_analyzer = None
-audio_analyzer = None
-gemini_integrator = None
+# Compress JSON responses (emotion scores, recommendations, helplines)
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=5)
 
 # ==================== Pydantic Models ====================
 class CombinedAnalysisRequest(BaseModel):
@@ -79,82 +278,18 @@ class CombinedAnalysisResponse(BaseModel):
     models_used: Dict[str, str]
     session_id: Optional[str] = None
 
-# ==================== Startup/Shutdown ====================
-@app.on_event("startup")
-async def startup_event():
-    """Initialize all analyzers on startup"""
-    global text_analyzer, video_analyzer, audio_analyzer, gemini_integrator
-    
-    logger.info("=" * 60)
-    logger.info("Starting Integrated Mental Health Analysis API v3.0.0")
-    logger.info("=" * 60)
-    
-    # Initialize Text Analyzer
-    try:
-        text_analyzer = TextSentimentAnalyzer()
-        logger.info("✓ Text Sentiment Analyzer initialized")
-    except Exception as e:
-        logger.error(f"✗ Failed to initialize Text Analyzer: {str(e)}")
-        text_analyzer = None
-    
-    # Initialize Video Analyzer
-    try:
-        video_analyzer = VideoEmotionDetector(use_hf_model=True)
-        logger.info("✓ Video Emotion Detector initialized")
-    except Exception as e:
-        logger.error(f"✗ Failed to initialize Video Analyzer: {str(e)}")
-        video_analyzer = None
-    
-    # Initialize Audio Analyzer
-    try:
-        audio_analyzer = AudioEmotionAnalyzer()
-        logger.info("✓ Audio Emotion Analyzer initialized")
-    except Exception as e:
-        logger.error(f"✗ Failed to initialize Audio Analyzer: {str(e)}")
-        audio_analyzer = None
-    
-    # Initialize Gemini Integrator
-    try:
-        gemini_integrator = GeminiIntegrator()
-        logger.info("✓ Gemini AI Integrator initialized")
-    except Exception as e:
-        logger.error(f"✗ Failed to initialize Gemini Integrator: {str(e)}")
-        gemini_integrator = None
-    
-    logger.info("=" * 60)
-    logger.info("API startup complete!")
-    logger.info("=" * 60)
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Cleanup resources on shutdown"""
-    if video_analyzer:
-        video_analyzer.cleanup()
-    logger.info("API shutdown complete")
-
 # ==================== Health & Info Endpoints ====================
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
     return {
-        "message": "Integrated Mental Health Analysis API",
-        "version": "3.0.0",
-        "status": "operational",
+        **ROOT_INFO,
         "modules": {
             "text_analysis": text_analyzer is not None,
             "audio_analysis": audio_analyzer is not None,
             "video_analysis": video_analyzer is not None,
             "ai_recommendations": gemini_integrator is not None
-        },
-        "endpoints": {
-            "text_analysis": "/analyze/text (POST)",
-            "audio_analysis": "/analyze/audio (POST)",
-            "video_analysis": "/analyze/video (POST)",
-            "combined_analysis": "/analyze/combined (POST)",
-            "health": "/health (GET)",
-            "models": "/models (GET)"
-        },
-        "documentation": "/docs"
+        }
     }
 
 @app.get("/health")
@@ -162,7 +297,7 @@ async def health_check():
     """Comprehensive health check"""
     return {
         "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now_iso(),
         "modules": {
             "text_analyzer": {
                 "available": text_analyzer is not None,
@@ -174,7 +309,8 @@ async def health_check():
             },
             "video_analyzer": {
                 "available": video_analyzer is not None,
-                "initialized": video_analyzer.initialized if video_analyzer else False
+                "initialized": video_analyzer.initialized if video_analyzer else False,
+                "model_ready": getattr(video_analyzer, "model_ready", False)
             },
             "gemini_integrator": {
                 "available": gemini_integrator is not None,
@@ -187,25 +323,11 @@ async def health_check():
 async def get_models_info():
     """Get information about all AI models being used"""
     return {
-        "text_models": {
-            "sentiment": "tabularisai/multilingual-sentiment-analysis",
-            "recommendations": "meta-llama/Llama-3.1-8B-Instruct:novita",
-            "status": "active" if text_analyzer else "inactive"
-        },
-        "audio_models": {
-            "emotion_recognition": "firdhokk/speech-emotion-recognition-with-openai-whisper-large-v3",
-            "status": "active" if audio_analyzer else "inactive"
-        },
-        "video_models": {
-            "facial_emotion": "dima806/facial_emotions_image_detection",
-            "face_detection": "MediaPipe Face Detection",
-            "status": "active" if video_analyzer else "inactive"
-        },
-        "ai_integration": {
-            "final_recommendations": "Google Gemini API",
-            "status": "active" if gemini_integrator else "inactive"
-        },
-        "python_version": "3.12.7"
+        **MODELS_INFO,
+        "text_models": {**MODELS_INFO["text_models"], "status": "active" if text_analyzer else "inactive"},
+        "audio_models": {**MODELS_INFO["audio_models"], "status": "active" if audio_analyzer else "inactive"},
+        "video_models": {**MODELS_INFO["video_models"], "status": "active" if video_analyzer else "inactive"},
+        "ai_integration": {**MODELS_INFO["ai_integration"], "status": "active" if gemini_integrator else "inactive"}
     }
 
 # ==================== Individual Analysis Endpoints ====================
@@ -241,12 +363,10 @@ async def analyze_text(request: TextAnalysisRequest):
                 detail="Text is too long (max 5000 characters)"
             )
         
-        # Perform analysis
-        analysis_result = text_analyzer.analyze_text(request.text)
+        # Perform analysis (blocks on the HF sentiment call, so keep it off the event loop)
+        analysis_result = await run_in_threadpool(text_analyzer.analyze_text, request.text)
         
         # Create response using the existing response model
-        from text_analyzer import MentalHealthResources
-        
         resources = MentalHealthResources(
             emergency_helplines=text_analyzer.MENTAL_HEALTH_RESOURCES["emergency_helplines"],
             telemedicine_services=text_analyzer.MENTAL_HEALTH_RESOURCES["telemedicine_services"],
@@ -263,7 +383,7 @@ async def analyze_text(request: TextAnalysisRequest):
             keywords_found=analysis_result["keywords_found"],
             recommendations=analysis_result["recommendations"],
             next_step=analysis_result["next_step"],
-            analysis_timestamp=datetime.now().isoformat(),
+            analysis_timestamp=analysis_result["analysis_timestamp"],
             session_id=request.session_id,
             model_used=analysis_result["model_used"],
             warning_flags=analysis_result.get("warning_flags", []),
@@ -272,7 +392,9 @@ async def analyze_text(request: TextAnalysisRequest):
         )
         
         logger.info(f"Text analysis complete - Risk: {analysis_result['risk_level']}")
-        return response
+        
+        # Already validated above; serialize directly instead of re-validating against response_model
+        return APIResponse(content=response.model_dump())
         
     except HTTPException:
         raise
@@ -308,22 +430,21 @@ async def analyze_audio(
             raise HTTPException(status_code=400, detail="No file provided")
         
         # Get file extension
-        file_ext = file.filename.split('.')[-1].lower()
-        allowed_formats = ["wav", "mp3", "m4a", "flac", "ogg"]
+        file_ext = upload_extension(file.filename)
         
-        if file_ext not in allowed_formats:
+        if file_ext not in AUDIO_FORMATS:
             raise HTTPException(
                 status_code=400,
-                detail=f"Unsupported format. Allowed: {', '.join(allowed_formats)}"
+                detail=f"Unsupported format. Allowed: {', '.join(AUDIO_FORMAT_NAMES)}"
             )
         
-        # Read file
-        audio_bytes = await file.read()
+        # Read file, rejecting oversized uploads before they are fully buffered
+        audio_bytes = await read_upload(file, MAX_AUDIO_SIZE_BYTES)
         
         logger.info(f"Processing audio file: {file.filename} ({len(audio_bytes)} bytes)")
         
         # Analyze audio
-        result = audio_analyzer.analyze_audio_file(audio_bytes, file_ext)
+        result = await run_in_threadpool(audio_analyzer.analyze_audio_file, audio_bytes, file_ext)
         
         # Add metadata
         result["session_id"] = session_id
@@ -332,7 +453,7 @@ async def analyze_audio(
         
         logger.info(f"Audio analysis complete - Emotion: {result['primary_emotion']}, Risk: {result['risk_level']}")
         
-        return JSONResponse(content=result)
+        return APIResponse(content=result)
         
     except HTTPException:
         raise
@@ -360,43 +481,39 @@ async def analyze_video(
             detail="Video analysis service is not available"
         )
     
-    import tempfile
-    import shutil
-    
     # Validate file type
-    allowed_types = ["video/mp4", "video/avi", "video/mov", "video/webm", "video/x-msvideo"]
-    
-    if file.content_type not in allowed_types:
+    if file.content_type not in VIDEO_CONTENT_TYPES:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported file type. Allowed: {', '.join(allowed_types)}"
+            detail=f"Unsupported file type. Allowed: {', '.join(VIDEO_CONTENT_TYPE_NAMES)}"
         )
     
     # Create temporary file
-    temp_dir = tempfile.mkdtemp()
-    temp_video_path = os.path.join(temp_dir, file.filename)
+    temp_video_path = temp_upload_path(file.filename)
     
     try:
-        # Save uploaded file
-        with open(temp_video_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Save uploaded file, hashing it in the same pass
+        digest = await run_in_threadpool(save_upload, file, temp_video_path)
         
         logger.info(f"Processing video file: {file.filename}")
         
-        # Process the video
-        analysis_result = video_analyzer.process_video(temp_video_path, frame_skip=frame_skip)
+        # Process the video (skipped for uploads already analyzed)
+        analysis_result, cache_hit = await run_in_threadpool(process_video_cached, temp_video_path, digest, frame_skip)
         
         # Add metadata
         analysis_result["metadata"] = {
             "filename": file.filename,
             "content_type": file.content_type,
             "frame_skip": frame_skip,
-            "processed_at": datetime.now().isoformat()
+            "processed_at": now_iso()
         }
         
         logger.info(f"Video analysis complete - Status: {analysis_result.get('status')}")
         
-        return JSONResponse(content=analysis_result)
+        return APIResponse(
+            content=analysis_result,
+            headers={"X-Cache": "HIT" if cache_hit else "MISS"}
+        )
         
     except Exception as e:
         logger.error(f"Video analysis error: {str(e)}", exc_info=True)
@@ -405,14 +522,11 @@ async def analyze_video(
             detail=f"Video processing failed: {str(e)}"
         )
     finally:
-        # Clean up temporary files
+        # Clean up temporary file
         try:
-            if os.path.exists(temp_video_path):
-                os.remove(temp_video_path)
-            if os.path.exists(temp_dir):
-                os.rmdir(temp_dir)
+            Path(temp_video_path).unlink(missing_ok=True)
         except Exception as e:
-            logger.warning(f"Failed to clean up temp files: {str(e)}")
+            logger.warning(f"Failed to clean up temp file: {str(e)}")
 
 # ==================== Combined Analysis Endpoint ====================
 @app.post("/analyze/combined", response_model=CombinedAnalysisResponse)
@@ -445,10 +559,21 @@ async def analyze_combined(
     logger.info(f"Inputs: text={bool(text)}, audio={bool(audio_file)}, video={bool(video_file)}")
     logger.info("=" * 60)
     
+    # Read the audio upload before starting any analysis, so an oversized file (413)
+    # can't leave the video branch running under video_lock for a discarded result
+    audio_bytes = await read_combined_audio(audio_file)
+    
+    # The three modalities are independent, so analyze them concurrently
+    text_result, audio_result, video_result = await asyncio.gather(
+        combined_text_analysis(text),
+        combined_audio_analysis(audio_bytes, audio_file.filename if audio_file else None),
+        combined_video_analysis(video_file)
+    )
+    
     results = {
-        "text_analysis": None,
-        "audio_analysis": None,
-        "video_analysis": None
+        "text_analysis": text_result,
+        "audio_analysis": audio_result,
+        "video_analysis": video_result
     }
     
     risk_scores = []
@@ -456,76 +581,31 @@ async def analyze_combined(
     all_emotions = []
     models_used = {}
     
-    # Analyze Text
-    if text and text_analyzer:
-        try:
-            logger.info("Performing text analysis...")
-            text_result = text_analyzer.analyze_text(text)
-            results["text_analysis"] = text_result
-            risk_scores.append(text_result["risk_score"])
-            confidences.append(text_result["confidence"])
-            all_emotions.extend(text_result["detected_emotions"])
-            models_used["text"] = text_result["model_used"]
-            logger.info(f"✓ Text analysis complete: {text_result['risk_level']}")
-        except Exception as e:
-            logger.error(f"Text analysis failed: {str(e)}")
-    
-    # Analyze Audio
-    if audio_file and audio_analyzer:
-        try:
-            logger.info("Performing audio analysis...")
-            audio_bytes = await audio_file.read()
-            file_ext = audio_file.filename.split('.')[-1].lower()
-            audio_result = audio_analyzer.analyze_audio_file(audio_bytes, file_ext)
-            results["audio_analysis"] = audio_result
-            risk_scores.append(audio_result["risk_score"])
-            confidences.append(audio_result["confidence"])
-            all_emotions.extend(audio_result["detected_emotions"])
-            models_used["audio"] = audio_result["model_used"]
-            logger.info(f"✓ Audio analysis complete: {audio_result['risk_level']}")
-        except Exception as e:
-            logger.error(f"Audio analysis failed: {str(e)}")
-    
-    # Analyze Video
-    if video_file and video_analyzer:
-        import tempfile
-        import shutil
-        
-        temp_dir = tempfile.mkdtemp()
-        temp_video_path = os.path.join(temp_dir, video_file.filename)
-        
-        try:
-            logger.info("Performing video analysis...")
-            with open(temp_video_path, "wb") as buffer:
-                shutil.copyfileobj(video_file.file, buffer)
-            
-            video_result = video_analyzer.process_video(temp_video_path, frame_skip=10)
-            results["video_analysis"] = video_result
+    if text_result:
+        risk_scores.append(text_result["risk_score"])
+        confidences.append(text_result["confidence"])
+        all_emotions.extend(text_result["detected_emotions"])
+        models_used["text"] = text_result["model_used"]
+    
+    if audio_result:
+        risk_scores.append(audio_result["risk_score"])
+        confidences.append(audio_result["confidence"])
+        all_emotions.extend(audio_result["detected_emotions"])
+        models_used["audio"] = audio_result["model_used"]
+    
+    if video_result:
+        # Calculate risk from video emotions
+        if video_result.get("status") == "success":
+            video_risk_score = calculate_video_risk_score(video_result)
+            risk_scores.append(video_risk_score)
+            confidences.append(0.7)  # Default confidence for video
             
-            # Calculate risk from video emotions
-            if video_result.get("status") == "success":
-                video_risk_score = calculate_video_risk_score(video_result)
-                risk_scores.append(video_risk_score)
-                confidences.append(0.7)  # Default confidence for video
-                
-                # Add detected emotions
-                if "summary" in video_result:
-                    emotion_dist = video_result["summary"].get("emotion_distribution", {})
-                    all_emotions.extend(list(emotion_dist.keys()))
-            
-            models_used["video"] = video_result.get("model_used", "MediaPipe + dima806/facial_emotions_image_detection")
-            logger.info(f"✓ Video analysis complete")
-            
-        except Exception as e:
-            logger.error(f"Video analysis failed: {str(e)}")
-        finally:
-            try:
-                if os.path.exists(temp_video_path):
-                    os.remove(temp_video_path)
-                if os.path.exists(temp_dir):
-                    os.rmdir(temp_dir)
-            except:
-                pass
+            # Add detected emotions
+            if "summary" in video_result:
+                emotion_dist = video_result["summary"].get("emotion_distribution", {})
+                all_emotions.extend(list(emotion_dist.keys()))
+        
+        models_used["video"] = video_result.get("model_used", "MediaPipe + dima806/facial_emotions_image_detection")
     
     # Calculate overall metrics
     if not risk_scores:
@@ -559,7 +639,9 @@ async def analyze_combined(
     if gemini_integrator:
         try:
             logger.info("Generating AI recommendations with Gemini...")
-            gemini_response = gemini_integrator.generate_recommendations(
+            # Gemini needs every modality's result, so it can't overlap them; keep its round trip off the event loop
+            gemini_response = await run_in_threadpool(
+                gemini_integrator.generate_recommendations,
                 overall_risk_score=overall_risk_score,
                 overall_risk_level=overall_risk_level,
                 text_analysis=results["text_analysis"],
@@ -581,14 +663,6 @@ async def analyze_combined(
     # Generate next steps
     next_steps = generate_next_steps(overall_risk_level, combined_emotions)
     
-    # Emergency resources
-    emergency_resources = {
-        "Vandrevala Foundation": "9999666555",
-        "iCall": "+91-9152987821",
-        "AASRA": "91-9820466726",
-        "National Mental Health Helpline": "08046110007"
-    }
-    
     response = CombinedAnalysisResponse(
         overall_risk_level=overall_risk_level,
         overall_risk_score=round(overall_risk_score, 2),
@@ -600,8 +674,8 @@ async def analyze_combined(
         ai_recommendations=ai_recommendations,
         personalized_advice=personalized_advice,
         next_steps=next_steps,
-        emergency_resources=emergency_resources,
-        analysis_timestamp=datetime.now().isoformat(),
+        emergency_resources=EMERGENCY_RESOURCES,
+        analysis_timestamp=now_iso(),
         models_used=models_used,
         session_id=session_id
     )
@@ -610,9 +684,128 @@ async def analyze_combined(
     logger.info("Combined analysis complete!")
     logger.info("=" * 60)
     
-    return response
+    # Already validated above; serialize directly instead of re-validating against response_model
+    return APIResponse(content=response.model_dump())
 
 # ==================== Helper Functions ====================
+async def combined_text_analysis(text: Optional[str]) -> Optional[Dict]:
+    """Text branch of /analyze/combined; None when skipped or failed"""
+    if not (text and text_analyzer):
+        return None
+    
+    try:
+        logger.info("Performing text analysis...")
+        text_result = await run_in_threadpool(text_analyzer.analyze_text, text)
+        logger.info(f"✓ Text analysis complete: {text_result['risk_level']}")
+        return text_result
+    except Exception as e:
+        logger.error(f"Text analysis failed: {str(e)}")
+        return None
+
+async def read_combined_audio(audio_file: Optional[UploadFile]) -> Optional[bytes]:
+    """Read the audio upload for /analyze/combined; None when skipped or unreadable (oversized uploads raise 413)"""
+    if not (audio_file and audio_analyzer):
+        return None
+    
+    try:
+        return await read_upload(audio_file, MAX_AUDIO_SIZE_BYTES)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Audio analysis failed: {str(e)}")
+        return None
+
+async def combined_audio_analysis(audio_bytes: Optional[bytes], filename: Optional[str]) -> Optional[Dict]:
+    """Audio branch of /analyze/combined; None when skipped or failed"""
+    if audio_bytes is None:
+        return None
+    
+    try:
+        logger.info("Performing audio analysis...")
+        file_ext = upload_extension(filename)
+        audio_result = await run_in_threadpool(audio_analyzer.analyze_audio_file, audio_bytes, file_ext)
+        logger.info(f"✓ Audio analysis complete: {audio_result['risk_level']}")
+        return audio_result
+    except Exception as e:
+        logger.error(f"Audio analysis failed: {str(e)}")
+        return None
+
+async def combined_video_analysis(video_file: Optional[UploadFile]) -> Optional[Dict]:
+    """Video branch of /analyze/combined; None when skipped or failed"""
+    if not (video_file and video_analyzer):
+        return None
+    
+    temp_video_path = temp_upload_path(video_file.filename)
+    
+    try:
+        logger.info("Performing video analysis...")
+        digest = await run_in_threadpool(save_upload, video_file, temp_video_path)
+        video_result, _ = await run_in_threadpool(process_video_cached, temp_video_path, digest, 10)
+        logger.info(f"✓ Video analysis complete")
+        return video_result
+    except Exception as e:
+        logger.error(f"Video analysis failed: {str(e)}")
+        return None
+    finally:
+        try:
+            Path(temp_video_path).unlink(missing_ok=True)
+        except:
+            pass
+
+def upload_extension(filename: Optional[str]) -> str:
+    """Lowercased extension without the dot; empty when the name has none"""
+    return os.path.splitext(os.path.basename(filename or ""))[1][1:].lower()
+
+def temp_upload_path(filename: str) -> str:
+    """Unique per-request temp path that keeps only the upload's extension"""
+    extension = os.path.splitext(os.path.basename(filename or ""))[1].lower()
+    return os.path.join(tempfile.gettempdir(), f"{uuid4().hex}{extension}")
+
+def save_upload(file: UploadFile, path: str) -> str:
+    """Stream an upload to disk in 1 MiB chunks, returning its SHA-256 hex digest"""
+    digest = hashlib.sha256()
+    with open(path, "wb", buffering=0) as buffer:
+        while True:
+            chunk = file.file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            buffer.write(chunk)
+    return digest.hexdigest()
+
+def process_video_cached(video_path: str, digest: str, frame_skip: int):
+    """Run process_video unless the same upload was already analyzed; returns (result, cache_hit)"""
+    cache_key = (digest, frame_skip)
+    cached = video_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached), True
+    
+    with video_lock:
+        # An identical upload queued ahead of us may have just finished
+        cached = video_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached), True
+        
+        result = video_analyzer.process_video(video_path, frame_skip=frame_skip)
+        if result.get("status") == "success":
+            video_cache.put(cache_key, dict(result))
+    return result, False
+
+async def read_upload(file: UploadFile, max_bytes: int) -> bytes:
+    """Read an upload in chunks, aborting with 413 once it exceeds max_bytes"""
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum size: {max_bytes // (1024 * 1024)}MB"
+            )
+    return bytes(buffer)
+
 def calculate_video_risk_score(video_result: Dict) -> float:
     """Calculate risk score from video emotion analysis"""
     if video_result.get("status") != "success":
@@ -621,22 +814,11 @@ def calculate_video_risk_score(video_result: Dict) -> float:
     summary = video_result.get("summary", {})
     emotion_dist = summary.get("emotion_distribution", {})
     
-    # Risk weights for emotions
-    emotion_risks = {
-        "sadness": 70,
-        "fear": 65,
-        "anger": 60,
-        "disgust": 50,
-        "neutral": 30,
-        "surprise": 25,
-        "happy": 15
-    }
-    
     risk_score = 0
     total_weight = 0
     
     for emotion, percentage in emotion_dist.items():
-        weight = emotion_risks.get(emotion.lower(), 40)
+        weight = VIDEO_EMOTION_RISKS.get(emotion.lower(), 40)
         risk_score += (weight * percentage / 100)
         total_weight += percentage
     
@@ -647,62 +829,18 @@ def calculate_video_risk_score(video_result: Dict) -> float:
 
 def get_fallback_recommendations(risk_level: str) -> List[str]:
     """Fallback recommendations when Gemini is unavailable"""
-    recommendations = {
-        "LOW": [
-            "Continue practicing daily self-care activities",
-            "Maintain regular sleep schedule and healthy eating habits",
-            "Stay connected with friends and family"
-        ],
-        "MEDIUM": [
-            "Consider scheduling a consultation with a mental health professional",
-            "Practice stress-reduction techniques like meditation or deep breathing",
-            "Reach out to supportive friends or family members"
-        ],
-        "HIGH": [
-            "Urgently consult with a mental health professional",
-            "Create a safety plan with trusted contacts",
-            "Avoid isolation and stay with supportive people"
-        ],
-        "CRITICAL": [
-            "🚨 CALL A CRISIS HELPLINE IMMEDIATELY",
-            "🚨 Go to the nearest emergency department",
-            "🚨 Do not stay alone - contact a trusted person NOW"
-        ]
-    }
-    return recommendations.get(risk_level, recommendations["MEDIUM"])
+    return list(FALLBACK_RECOMMENDATIONS.get(risk_level, FALLBACK_RECOMMENDATIONS["MEDIUM"]))
 
 def generate_next_steps(risk_level: str, emotions: List[str]) -> List[str]:
     """Generate actionable next steps"""
-    base_steps = {
-        "LOW": [
-            "Continue monitoring your mental wellbeing",
-            "Maintain healthy lifestyle habits",
-            "Practice mindfulness or meditation regularly"
-        ],
-        "MEDIUM": [
-            "Schedule an appointment with a counselor or therapist",
-            "Explore online therapy platforms for convenient access",
-            "Join a support group or community"
-        ],
-        "HIGH": [
-            "Seek immediate professional mental health support",
-            "Inform a trusted person about your situation",
-            "Remove access to any means of self-harm"
-        ],
-        "CRITICAL": [
-            "Contact emergency services or crisis helpline NOW",
-            "Go to nearest hospital emergency department",
-            "Stay with a trusted person continuously"
-        ]
-    }
-    
-    steps = base_steps.get(risk_level, base_steps["MEDIUM"])
+    steps = list(BASE_NEXT_STEPS.get(risk_level, BASE_NEXT_STEPS["MEDIUM"]))
+    emotion_set = set(emotions)
     
     # Add emotion-specific steps
-    if "anxiety" in emotions or "fear" in emotions:
+    if not emotion_set.isdisjoint(ANXIETY_EMOTIONS):
         steps.append("Practice breathing exercises for anxiety management")
     
-    if "sadness" in emotions:
+    if "sadness" in emotion_set:
         steps.append("Engage in activities that previously brought you joy")
     
     return steps
@@ -715,6 +853,12 @@ if __name__ == "__main__":
     parser.add_argument("--host", default="0.0.0.0", help="Host to bind to")
     parser.add_argument("--port", type=int, default=8000, help="Port to bind to")
     parser.add_argument("--reload", action="store_true", help="Enable auto-reload")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_CONCURRENCY", "1")),
+        help="Worker processes (each loads its own models; ignored with --reload)"
+    )
     
     args = parser.parse_args()
     
@@ -724,6 +868,8 @@ if __name__ == "__main__":
     print(f"📡 API Endpoint: http://{args.host}:{args.port}")
     print(f"📚 Documentation: http://{args.host}:{args.port}/docs")
     print(f"🔧 Models: Text + Audio + Video + Gemini AI")
+    if args.workers > 1 and not args.reload:
+        print(f"👥 Workers: {args.workers} (each holds its own copy of the models in RAM)")
     print("=" * 70)
     print("\nPress Ctrl+C to stop\n")
     
@@ -732,6 +878,10 @@ if __name__ == "__main__":
         host=args.host,
         port=args.port,
         reload=args.reload,
+        workers=1 if args.reload else args.workers,  # uvicorn can't combine reload with workers
+        loop="asyncio" if sys.platform == "win32" else "uvloop",  # uvloop has no Windows build
+        http="httptools",
+        timeout_keep_alive=30,
         log_level="info",
         access_log=True
     )
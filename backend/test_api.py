@@ -8,12 +8,17 @@ import requests
 import json
 import time
 import sys
+import tempfile
 from pathlib import Path
 
 # API Configuration
 API_BASE_URL = "http://localhost:8000"
 TIMEOUT = 30
 
+# Shared keep-alive session so every test reuses the same connection pool
+SESSION = requests.Session()
+SESSION.mount("http://", requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=0))
+
 def print_header(text):
     """Print formatted header"""
     print("\n" + "="*70)
@@ -25,12 +30,30 @@ def print_result(success, message):
     status = "✅ PASS" if success else "❌ FAIL"
     print(f"{status}: {message}")
 
+def _tone(freq, sample_rate=16000, duration=3, amp=0.3):
+    """Generate a float32 sine tone without building an intermediate time array"""
+    import numpy as np
+    
+    n = sample_rate * duration
+    return amp * np.sin(np.arange(n, dtype=np.float32) * np.float32(2 * np.pi * freq / sample_rate))
+
+def wait_for_api(max_wait=10.0):
+    """Poll /health until the API answers instead of sleeping a fixed amount"""
+    deadline = time.monotonic() + max_wait
+    while time.monotonic() < deadline:
+        try:
+            SESSION.get(f"{API_BASE_URL}/health", timeout=0.25)
+            return True
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+    return False
+
 def test_api_health():
     """Test API health endpoint"""
     print_header("Testing API Health")
     
     try:
-        response = requests.get(f"{API_BASE_URL}/health", timeout=5)
+        response = SESSION.get(f"{API_BASE_URL}/health", timeout=5)
         
         if response.status_code == 200:
             data = response.json()
@@ -62,7 +85,7 @@ def test_models_info():
     print_header("Testing Models Information")
     
     try:
-        response = requests.get(f"{API_BASE_URL}/models", timeout=5)
+        response = SESSION.get(f"{API_BASE_URL}/models", timeout=5)
         
         if response.status_code == 200:
             data = response.json()
@@ -115,7 +138,7 @@ def test_text_analysis():
         print(f"   Text: '{test_case['text'][:50]}...'")
         
         try:
-            response = requests.post(
+            response = SESSION.post(
                 f"{API_BASE_URL}/analyze/text",
                 json={"text": test_case['text']},
                 timeout=TIMEOUT
@@ -153,24 +176,21 @@ def test_audio_analysis():
     """Test audio analysis endpoint (requires audio file)"""
     print_header("Testing Audio Analysis")
     
-    # Check if test audio file exists
-    test_audio_path = Path("test_audio.wav")
+    # Generated clips go to the temp dir so they never land in the working tree
+    test_audio_path = Path(tempfile.gettempdir()) / "test_audio.wav"
     
     if not test_audio_path.exists():
         print("⚠️  No test audio file found (test_audio.wav)")
         print("   Creating a simple test audio file...")
         
         try:
-            import numpy as np
             import soundfile as sf
             
             # Generate a simple test tone
             sample_rate = 16000
-            duration = 3
-            t = np.linspace(0, duration, sample_rate * duration)
-            audio = 0.3 * np.sin(2 * np.pi * 440 * t)  # A4 note
+            audio = _tone(440, sample_rate)  # A4 note
             
-            sf.write('test_audio.wav', audio, sample_rate)
+            sf.write(test_audio_path, audio, sample_rate)
             print_result(True, "Test audio file created")
             
         except Exception as e:
@@ -179,10 +199,10 @@ def test_audio_analysis():
             return True  # Don't fail the entire test suite
     
     try:
-        with open('test_audio.wav', 'rb') as f:
+        with open(test_audio_path, 'rb') as f:
             files = {'file': ('test_audio.wav', f, 'audio/wav')}
             
-            response = requests.post(
+            response = SESSION.post(
                 f"{API_BASE_URL}/analyze/audio",
                 files=files,
                 timeout=TIMEOUT
@@ -231,7 +251,7 @@ def test_video_analysis():
             data = {'frame_skip': 10}
             
             print("   Processing video (this may take a minute)...")
-            response = requests.post(
+            response = SESSION.post(
                 f"{API_BASE_URL}/analyze/video",
                 files=files,
                 data=data,
@@ -280,7 +300,7 @@ def test_combined_analysis():
         }
         
         print("   Running combined analysis with text input...")
-        response = requests.post(
+        response = SESSION.post(
             f"{API_BASE_URL}/analyze/combined",
             data=data,
             timeout=TIMEOUT
@@ -320,6 +340,9 @@ def main():
     print(f"Testing API at: {API_BASE_URL}")
     print(f"Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}")
     
+    if not wait_for_api():
+        print(f"⚠️  API did not become ready at {API_BASE_URL}")
+    
     results = {
         "API Health": test_api_health(),
         "Models Info": test_models_info(),
@@ -3,13 +3,23 @@ from fastapi import HTTPException
 from pydantic import BaseModel, ConfigDict
 from typing import Dict, List, Optional, Literal
 import logging
-from datetime import datetime
 import re
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 from dotenv import load_dotenv
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+from clock import now_iso
+from result_cache import ResultCache, content_digest
+
+try:
+    import ahocorasick
+except ImportError:  # optional: fall back to one substring search per phrase
+    ahocorasick = None
 
 load_dotenv()
 
@@ -29,9 +39,83 @@ else:
 SENTIMENT_MODEL = "tabularisai/multilingual-sentiment-analysis"
 TEXT_GEN_MODEL = "meta-llama/Llama-3.1-8B-Instruct"
 
+# Threads for HF sentiment requests that overlap with the local keyword scans
+HF_WORKERS = int(os.getenv("HF_WORKERS", "4"))
+
+# Full analyses kept per text hash (retries, dashboards re-posting the same entry)
+TEXT_CACHE_SIZE = int(os.getenv("TEXT_CACHE_SIZE", "4096"))
+
 # ==================== Hugging Face API Endpoints ====================
 HF_API_BASE = "https://router.huggingface.co/"
 
+# ==================== Scoring Tables ====================
+FALLBACK_SENTIMENT = {"LOW": 70, "MEDIUM": 50, "HIGH": 30, "CRITICAL": 15}
+RISK_BASE = {"LOW": 20, "MEDIUM": 45, "HIGH": 70, "CRITICAL": 90}
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH", "CRITICAL")  # ascending severity
+RISK_RANK = {level: rank for rank, level in enumerate(RISK_LEVELS)}
+NEXT_STEPS = {
+    "LOW": "Continue self-care practices and monitor your wellbeing",
+    "MEDIUM": "Consider seeking professional support for better guidance",
+    "HIGH": "Urgently consult with a mental health professional",
+    "CRITICAL": "Immediate intervention required - use emergency resources"
+}
+
+# ==================== Emotion Patterns ====================
+EMOTION_PATTERNS = {
+    "anger": ["angry", "mad", "frustrated", "irritated", "annoyed", "furious"],
+    "fear": ["scared", "afraid", "anxious", "worried", "nervous", "panic", "terrified"],
+    "sadness": ["sad", "depressed", "hopeless", "empty", "lonely", "miserable", "heartbroken"],
+    "stress": ["stressed", "pressure", "overwhelmed", "burdened", "tension", "burned out"],
+    "confusion": ["confused", "lost", "uncertain", "unsure", "doubt", "disoriented"],
+    "loneliness": ["lonely", "isolated", "alone", "abandoned", "separated"],
+    "guilt": ["guilty", "ashamed", "remorseful", "regretful", "blame"],
+    "anxiety": ["anxious", "worried", "nervous", "restless", "on edge", "uneasy"]
+}
+
+class SubstringScanner:
+    """Drop-in for ahocorasick.Automaton when pyahocorasick is not installed"""
+    
+    def __init__(self):
+        self._phrases = {}
+    
+    def get(self, phrase: str, default=None):
+        return self._phrases.get(phrase, default)
+    
+    def add_word(self, phrase: str, value) -> None:
+        self._phrases[phrase] = value
+    
+    def make_automaton(self) -> None:
+        pass
+    
+    def iter(self, text: str):
+        """Yield (end_index, value) for the first occurrence of each phrase, ordered by end like the automaton"""
+        hits = []
+        for phrase, value in self._phrases.items():
+            start = text.find(phrase)
+            if start >= 0:
+                hits.append((start + len(phrase) - 1, value))
+        hits.sort(key=lambda hit: hit[0])
+        return iter(hits)
+
+def build_phrase_automaton(patterns: Dict[str, List[str]]):
+    """Compile {label: [phrases]} into one Aho-Corasick automaton mapping each phrase to (phrase, labels)"""
+    automaton = ahocorasick.Automaton() if ahocorasick else SubstringScanner()
+    for label, phrases in patterns.items():
+        for phrase in phrases:
+            labels = automaton.get(phrase, (phrase, ()))[1]
+            automaton.add_word(phrase, (phrase, labels + (label,)))
+    automaton.make_automaton()
+    return automaton
+
+# One pass over the text finds every emotion phrase (substring matches, as before)
+EMOTION_AUTOMATON = build_phrase_automaton(EMOTION_PATTERNS)
+
+# ==================== Warning Patterns ====================
+# Single precompiled alternation instead of one substring scan per phrase
+SUICIDAL_IDEATION_PATTERN = re.compile("|".join(
+    re.escape(phrase) for phrase in ["suicide", "kill myself", "end my life", "want to die"]
+))
+
 # ==================== Pydantic Models ====================
 class TextAnalysisRequest(BaseModel):
     text: str
@@ -71,6 +155,29 @@ class TextSentimentAnalyzer:
         self.initialized = True
         self.hf_available = HF_AVAILABLE
         self.hf_token = HF_TOKEN
+        self._pool = ThreadPoolExecutor(max_workers=HF_WORKERS, thread_name_prefix="hf-sentiment")
+        
+        # Keep-alive connections to the HF router, one per sentiment worker
+        self._session = requests.Session()
+        self._session.headers.update({
+            "Authorization": f"Bearer {self.hf_token}",
+            "Content-Type": "application/json"
+        })
+        adapter = HTTPAdapter(
+            pool_connections=HF_WORKERS,
+            pool_maxsize=HF_WORKERS,
+            max_retries=Retry(total=2, backoff_factor=0.1)
+        )
+        self._session.mount("https://", adapter)
+        
+        # Risk keywords: one automaton pass per text, reported in RISK_PATTERNS order
+        self._risk_automaton = build_phrase_automaton(self.RISK_PATTERNS)
+        self._risk_keyword_index = {}
+        for level, keywords in self.RISK_PATTERNS.items():
+            for keyword in keywords:
+                self._risk_keyword_index.setdefault((level, keyword), len(self._risk_keyword_index))
+        
+        self.result_cache = ResultCache(maxsize=TEXT_CACHE_SIZE)
         
     # ==================== MENTAL HEALTH RESOURCES ====================
     MENTAL_HEALTH_RESOURCES = {
@@ -132,17 +239,11 @@ class TextSentimentAnalyzer:
     def _make_hf_api_call(self, model: str, payload: dict):
         """Make API call to Hugging Face"""
         try:
-            headers = {
-                "Authorization": f"Bearer {self.hf_token}",
-                "Content-Type": "application/json"
-            }
-            
             url = f"{HF_API_BASE}/{model}"
             logger.info(f"Calling HF API: {model}")
             
-            response = requests.post(
+            response = self._session.post(
                 url,
-                headers=headers,
                 json=payload,
                 timeout=30
             )
@@ -207,41 +308,38 @@ class TextSentimentAnalyzer:
     def detect_risk_keywords(self, text: str):
         """Detect risk keywords in text"""
         text_lower = text.lower()
-        found_keywords = []
-        max_risk_level = "LOW"
         
-        risk_order = {"CRITICAL": 4, "HIGH": 3, "MEDIUM": 2, "LOW": 1}
+        # Each distinct phrase counts once, however often it occurs
+        matched = dict(value for _, value in self._risk_automaton.iter(text_lower))
         
-        for level, keywords in self.RISK_PATTERNS.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    found_keywords.append(f"{keyword} ({level})")
-                    if risk_order[level] > risk_order[max_risk_level]:
-                        max_risk_level = level
+        hits = sorted(
+            (self._risk_keyword_index[(level, keyword)], keyword, level)
+            for keyword, levels in matched.items()
+            for level in levels
+        )
+        
+        found_keywords = []
+        max_rank = 0
+        for _, keyword, level in hits:
+            found_keywords.append(f"{keyword} ({level})")
+            rank = RISK_RANK[level]
+            if rank > max_rank:
+                max_rank = rank
         
-        return found_keywords, max_risk_level
+        return found_keywords, RISK_LEVELS[max_rank]
     
     def detect_emotions(self, text: str):
         """Detect basic emotions from text"""
         text_lower = text.lower()
-        emotions = []
-        
-        emotion_patterns = {
-            "anger": ["angry", "mad", "frustrated", "irritated", "annoyed", "furious"],
-            "fear": ["scared", "afraid", "anxious", "worried", "nervous", "panic", "terrified"],
-            "sadness": ["sad", "depressed", "hopeless", "empty", "lonely", "miserable", "heartbroken"],
-            "stress": ["stressed", "pressure", "overwhelmed", "burdened", "tension", "burned out"],
-            "confusion": ["confused", "lost", "uncertain", "unsure", "doubt", "disoriented"],
-            "loneliness": ["lonely", "isolated", "alone", "abandoned", "separated"],
-            "guilt": ["guilty", "ashamed", "remorseful", "regretful", "blame"],
-            "anxiety": ["anxious", "worried", "nervous", "restless", "on edge", "uneasy"]
-        }
+        found = set()
+        
+        for _, (_, labels) in EMOTION_AUTOMATON.iter(text_lower):
+            found.update(labels)
         
-        for emotion, words in emotion_patterns.items():
-            if any(word in text_lower for word in words):
-                emotions.append(emotion)
+        # Report in pattern order, as the per-emotion scan did
+        emotions = [emotion for emotion in EMOTION_PATTERNS if emotion in found]
         
-        return list(dict.fromkeys(emotions))[:5]
+        return emotions[:5]
     
     def get_fallback_recommendations(self, risk_level: str):
         """Fallback recommendations when AI fails"""
@@ -277,16 +375,28 @@ class TextSentimentAnalyzer:
         if len(text) < 10:
             return self.get_minimal_analysis()
         
+        # Identical texts skip the HF round trip entirely
+        cache_key = content_digest(text.encode("utf-8"))
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            return {**cached, "analysis_timestamp": now_iso()}
+        
+        # Start the HF sentiment request first so the network round trip overlaps the local scans
+        sentiment_future = self._pool.submit(self.analyze_sentiment_with_hf, text) if self.hf_available else None
+        
         # Detect risk keywords
         keywords, risk_level = self.detect_risk_keywords(text)
         
-        # Analyze sentiment with HF if available
+        # Detect emotions
+        emotions = self.detect_emotions(text)
+        
+        # Collect sentiment from HF if available
         sentiment_result = None
         model_used = "Keyword Analysis"
         
-        if self.hf_available:
+        if sentiment_future is not None:
             try:
-                sentiment_result = self.analyze_sentiment_with_hf(text)
+                sentiment_result = sentiment_future.result()
                 if sentiment_result:
                     model_used = f"Hugging Face: {SENTIMENT_MODEL}"
                     logger.info(f"Sentiment: {sentiment_result['label']} ({sentiment_result['score']:.2f})")
@@ -308,55 +418,42 @@ class TextSentimentAnalyzer:
             else:
                 sentiment_value = 50
         else:
-            sentiment_base = {"LOW": 70, "MEDIUM": 50, "HIGH": 30, "CRITICAL": 15}
-            sentiment_value = sentiment_base.get(risk_level, 50)
-        
-        # Detect emotions
-        emotions = self.detect_emotions(text)
-        
-        # Calculate risk score
-        risk_base = {"LOW": 20, "MEDIUM": 45, "HIGH": 70, "CRITICAL": 90}
-        risk_score = risk_base.get(risk_level, 50)
-        
-        # Adjust based on sentiment
-        sentiment_adjustment = (100 - sentiment_value) * 0.3
-        risk_score = min(100, risk_score + sentiment_adjustment)
+            sentiment_value = FALLBACK_SENTIMENT.get(risk_level, 50)
         
-        # Adjust based on number of keywords
-        keyword_adjustment = len(keywords) * 5
-        risk_score = min(100, risk_score + keyword_adjustment)
+        # Calculate risk score, adjusted by sentiment and keyword count
+        # (both adjustments are non-negative, so a single clamp at the end is equivalent)
+        keyword_count = len(keywords)
+        risk_score = RISK_BASE.get(risk_level, 50) + (100 - sentiment_value) * 0.3 + keyword_count * 5
+        if risk_score > 100:
+            risk_score = 100
         
         # Calculate confidence
-        confidence = 0.6 + (len(keywords) * 0.05) + (0.2 if sentiment_result else 0)
-        confidence = min(0.95, confidence)
+        confidence = 0.6 + (keyword_count * 0.05) + (0.2 if sentiment_result else 0)
+        if confidence > 0.95:
+            confidence = 0.95
         
         # Get recommendations
         recommendations = self.get_fallback_recommendations(risk_level)
         
         # Get next step based on risk level
-        next_steps = {
-            "LOW": "Continue self-care practices and monitor your wellbeing",
-            "MEDIUM": "Consider seeking professional support for better guidance",
-            "HIGH": "Urgently consult with a mental health professional",
-            "CRITICAL": "Immediate intervention required - use emergency resources"
-        }
-        next_step = next_steps.get(risk_level, "Monitor your mental health regularly")
+        next_step = NEXT_STEPS.get(risk_level, "Monitor your mental health regularly")
         
         # Prepare results
+        sentiment_ratio = sentiment_value / 100
         results = {
             "risk_level": risk_level,
             "risk_score": float(round(risk_score, 1)),
             "confidence": float(round(confidence, 2)),
             "sentiment_scores": {
                 "overall": float(round(sentiment_value, 1)),
-                "positive_ratio": float(round(sentiment_value / 100, 2)),
-                "negative_ratio": float(round(1 - (sentiment_value / 100), 2))
+                "positive_ratio": float(round(sentiment_ratio, 2)),
+                "negative_ratio": float(round(1 - sentiment_ratio, 2))
             },
             "detected_emotions": emotions,
             "keywords_found": keywords[:10],
             "recommendations": recommendations[:3],
             "next_step": next_step,
-            "analysis_timestamp": datetime.now().isoformat(),
+            "analysis_timestamp": now_iso(),
             "model_used": model_used,
             "warning_flags": [],
             "mental_health_resources": self.MENTAL_HEALTH_RESOURCES,
@@ -367,7 +464,7 @@ class TextSentimentAnalyzer:
         if risk_level in ["CRITICAL", "HIGH"]:
             results["warning_flags"].append(f"Detected {risk_level} risk level")
         
-        if any(word in text.lower() for word in ["suicide", "kill myself", "end my life", "want to die"]):
+        if SUICIDAL_IDEATION_PATTERN.search(text.lower()):
             results["warning_flags"].append("Suicidal ideation detected - Immediate help recommended")
         
         if len(keywords) > 5:
@@ -387,6 +484,11 @@ class TextSentimentAnalyzer:
         
         results["context_notes"] = context_notes
         
+        # Don't pin a keyword-only result just because the HF API failed once
+        if sentiment_result or not self.hf_available:
+            self.result_cache.put(cache_key, results)
+            return dict(results)
+        
         return results
     
     def get_minimal_analysis(self):
@@ -404,7 +506,7 @@ class TextSentimentAnalyzer:
             "keywords_found": ["Text too short for detailed analysis"],
             "recommendations": self.get_fallback_recommendations("LOW")[:3],
             "next_step": "Write more details for better analysis",
-            "analysis_timestamp": datetime.now().isoformat(),
+            "analysis_timestamp": now_iso(),
             "model_used": "Fallback Analysis",
             "warning_flags": ["Text is very short - consider writing more for better analysis"],
             "mental_health_resources": self.MENTAL_HEALTH_RESOURCES,
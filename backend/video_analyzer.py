@@ -6,12 +6,28 @@ from PIL import Image
 import logging
 from typing import List, Dict, Optional, Tuple
 import tempfile
+import importlib.util
 import os
 import time
+from contextlib import nullcontext
+
+try:
+    import torch
+except ImportError:  # only the Hugging Face classifier needs it
+    torch = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Configuration
+FACIAL_EMOTION_MODEL = "dima806/facial_emotions_image_detection"
+QUANTIZE = os.getenv("QUANTIZE") == "1"
+HF_BATCH_SIZE = int(os.getenv("HF_BATCH_SIZE", "16"))  # face crops per classifier call
+ONNX_INT8_DIR = os.getenv("ONNX_INT8_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_int8"))
+
+# No autograd bookkeeping for pure inference
+inference_mode = torch.inference_mode if torch is not None else nullcontext
+
 class VideoEmotionDetector:
     def __init__(self, use_hf_model: bool = True):
         logger.info("Initializing VideoEmotionDetector...")
@@ -31,11 +47,17 @@ class VideoEmotionDetector:
                 try:
                     from transformers import pipeline
                     logger.info("Loading Hugging Face facial emotion model...")
-                    self.emotion_classifier = pipeline(
-                        "image-classification", 
-                        model="dima806/facial_emotions_image_detection",
-                        device=-1  # Use CPU
-                    )
+                    if QUANTIZE:
+                        self.emotion_classifier = self._load_quantized_classifier()
+                    if self.emotion_classifier is None:
+                        device, torch_dtype = self._select_device()
+                        self.emotion_classifier = pipeline(
+                            "image-classification", 
+                            model=FACIAL_EMOTION_MODEL,
+                            device=device,
+                            torch_dtype=torch_dtype,
+                            model_kwargs=self._load_kwargs()
+                        )
                     logger.info("Hugging Face emotion model loaded successfully")
                 except Exception as e:
                     logger.warning(f"Failed to load Hugging Face model: {str(e)}")
@@ -72,33 +94,117 @@ class VideoEmotionDetector:
             self.initialized = False
             raise
 
-    def _detect_emotion_hf(self, face_image: np.ndarray) -> Tuple[str, float, List[Dict]]:
-        """Detect emotion using Hugging Face model"""
-        if not self.emotion_classifier:
-            return "neutral", 0.5, []
+    @staticmethod
+    def _select_device():
+        """Pick the pipeline device and dtype: half precision on CUDA, FP32 on CPU"""
+        if torch is None:
+            raise ImportError("PyTorch is required for the Hugging Face emotion model")
         
+        if torch.cuda.is_available():
+            # bf16 keeps FP32's exponent range on Ampere+, fp16 otherwise
+            torch_dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+            logger.info(f"Using CUDA device 0 with {torch_dtype}")
+            return 0, torch_dtype
+        
+        return -1, torch.float32
+
+    @staticmethod
+    def _load_kwargs() -> Dict:
+        """Load weights straight into the target dtype when accelerate is available"""
+        if importlib.util.find_spec("accelerate") is None:
+            return {}
+        return {"low_cpu_mem_usage": True}
+
+    def _load_quantized_classifier(self):
+        """Load the facial emotion model as a dynamically quantized INT8 ONNX Runtime session"""
         try:
-            pil_image = Image.fromarray(face_image)
-            predictions = self.emotion_classifier(pil_image)
+            from transformers import AutoImageProcessor, pipeline
+            from optimum.onnxruntime import ORTModelForImageClassification, ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
             
-            if predictions:
-                top_prediction = predictions[0]
-                emotion = self.EMOTION_MAP.get(top_prediction['label'].lower(), top_prediction['label'])
-                confidence = top_prediction['score']
-                
-                top_predictions = []
-                for pred in predictions[:3]:
-                    top_predictions.append({
-                        'emotion': self.EMOTION_MAP.get(pred['label'].lower(), pred['label']),
-                        'confidence': float(pred['score'])
-                    })
-                
-                return emotion, confidence, top_predictions
+            # Export and quantize once, then reuse the cached model on later startups
+            if not os.path.isdir(ONNX_INT8_DIR):
+                logger.info(f"Exporting {FACIAL_EMOTION_MODEL} to ONNX INT8 at {ONNX_INT8_DIR}...")
+                onnx_model = ORTModelForImageClassification.from_pretrained(FACIAL_EMOTION_MODEL, export=True)
+                quantizer = ORTQuantizer.from_pretrained(onnx_model)
+                quantization_config = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=True)
+                quantizer.quantize(save_dir=ONNX_INT8_DIR, quantization_config=quantization_config)
+                AutoImageProcessor.from_pretrained(FACIAL_EMOTION_MODEL).save_pretrained(ONNX_INT8_DIR)
+            
+            model = ORTModelForImageClassification.from_pretrained(
+                ONNX_INT8_DIR,
+                file_name="model_quantized.onnx",
+                provider="CPUExecutionProvider"
+            )
+            image_processor = AutoImageProcessor.from_pretrained(ONNX_INT8_DIR)
+            logger.info("Using INT8 ONNX Runtime facial emotion model")
+            return pipeline("image-classification", model=model, image_processor=image_processor)
+            
+        except Exception as e:
+            logger.warning(f"INT8 ONNX model unavailable, using FP32 pipeline: {str(e)}")
+            return None
+
+    def warmup(self) -> bool:
+        """Run one dummy face crop through the classifier so the first request skips lazy setup"""
+        self.model_ready = False
+        if not (self.use_hf_model and self.emotion_classifier):
+            return False
+        
+        try:
+            with inference_mode():
+                self.emotion_classifier([Image.new("RGB", (224, 224))], batch_size=1)
+            if torch is not None and torch.cuda.is_available():
+                # Wait for the kernels to finish, then hand warmup scratch memory back
+                torch.cuda.synchronize()
+                torch.cuda.empty_cache()
+            self.model_ready = True
+        except Exception as e:
+            logger.warning(f"Facial emotion model warmup failed: {str(e)}")
+        
+        return self.model_ready
+
+    def _detect_emotions_hf(self, face_images: List[Image.Image]) -> List[Tuple[str, float, List[Dict]]]:
+        """Detect emotions for a batch of face crops using Hugging Face model"""
+        default = ("neutral", 0.5, [])
+        if not self.emotion_classifier:
+            return [default] * len(face_images)
+        
+        try:
+            with inference_mode():
+                batch_predictions = self.emotion_classifier(face_images, batch_size=len(face_images))
+            return [self._parse_hf_predictions(predictions) or default for predictions in batch_predictions]
         
         except Exception as e:
             logger.warning(f"HF emotion detection failed: {str(e)}")
         
-        return "neutral", 0.5, []
+        return [default] * len(face_images)
+
+    def _parse_hf_predictions(self, predictions: List[Dict]) -> Optional[Tuple[str, float, List[Dict]]]:
+        """Map raw classifier output for one face to (emotion, confidence, top predictions)"""
+        if not predictions:
+            return None
+        
+        top_prediction = predictions[0]
+        emotion = self.EMOTION_MAP.get(top_prediction['label'].lower(), top_prediction['label'])
+        confidence = top_prediction['score']
+        
+        top_predictions = []
+        for pred in predictions[:3]:
+            top_predictions.append({
+                'emotion': self.EMOTION_MAP.get(pred['label'].lower(), pred['label']),
+                'confidence': float(pred['score'])
+            })
+        
+        return emotion, confidence, top_predictions
+
+    def _classify_pending_faces(self, pending_faces: List[Tuple[Image.Image, Dict]]):
+        """Classify queued face crops in one batch and fill in their timeline entries"""
+        results = self._detect_emotions_hf([face for face, _ in pending_faces])
+        for (_, entry), (emotion, confidence, predictions) in zip(pending_faces, results):
+            entry["emotion"] = emotion
+            entry["confidence"] = round(confidence, 4)
+            entry["all_predictions"] = predictions[:3]
+        pending_faces.clear()
 
     def _approximate_emotion_from_landmarks(self, landmarks) -> Tuple[str, float]:
         """Approximate emotion based on facial landmarks"""
@@ -175,6 +281,7 @@ class VideoEmotionDetector:
         logger.info(f"Processing settings: frame_skip={frame_skip}, max_frames={max_frames}")
         
         results_timeline = []
+        pending_faces = []
         frame_count = 0
         processed_frames = 0
         total_processing_time = 0
@@ -189,7 +296,7 @@ class VideoEmotionDetector:
                     frame_count += 1
                     continue
 
-                start_time = time.time()
+                start_time = time.perf_counter()
                 
                 rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 detection_results = self.face_detection.process(rgb_frame)
@@ -217,7 +324,7 @@ class VideoEmotionDetector:
                             all_predictions = []
                             
                             if self.use_hf_model and self.emotion_classifier:
-                                emotion, confidence, all_predictions = self._detect_emotion_hf(face_img)
+                                # Classified in batches; the timeline entry is filled in when the batch runs
                                 detection_method = "hugging_face"
                             else:
                                 face_mesh_results = self.face_mesh.process(face_img)
@@ -237,7 +344,7 @@ class VideoEmotionDetector:
                             
                             timestamp = frame_count / fps if fps > 0 else 0
                             
-                            results_timeline.append({
+                            entry = {
                                 "timestamp": round(timestamp, 2),
                                 "emotion": emotion,
                                 "confidence": round(confidence, 4),
@@ -248,16 +355,28 @@ class VideoEmotionDetector:
                                 "frame": frame_count,
                                 "detection_method": detection_method,
                                 "all_predictions": all_predictions[:3]
-                            })
+                            }
+                            results_timeline.append(entry)
                             processed_frames += 1
+                            
+                            if detection_method == "hugging_face":
+                                # Copying into a PIL image releases the full frame
+                                pending_faces.append((Image.fromarray(face_img), entry))
+                                if len(pending_faces) >= HF_BATCH_SIZE:
+                                    self._classify_pending_faces(pending_faces)
                         
                         break
                 
                 frame_count += 1
-                total_processing_time += time.time() - start_time
+                total_processing_time += time.perf_counter() - start_time
                 
                 if frame_count % 100 == 0:
                     logger.info(f"Processed {frame_count}/{total_frames} frames...")
+            
+            if pending_faces:
+                start_time = time.perf_counter()
+                self._classify_pending_faces(pending_faces)
+                total_processing_time += time.perf_counter() - start_time
                     
         except Exception as e:
             logger.error(f"Error processing video: {str(e)}")
@@ -278,44 +397,37 @@ class VideoEmotionDetector:
                 "summary": {},
                 "duration": round(duration, 2),
                 "processing_time": round(processing_time, 2),
-                "model_used": "dima806/facial_emotions_image_detection" if self.use_hf_model else "mediapipe_approximation"
+                "model_used": FACIAL_EMOTION_MODEL if self.use_hf_model else "mediapipe_approximation"
             }
         
+        # One pass over the timeline for counts, confidence totals and transitions
         emotion_counts = {}
-        emotion_confidences = {}
-        
+        confidence_totals = {}
+        emotion_transitions = []
+        previous_emotion = None
         for entry in timeline:
             emotion = entry['emotion']
-            confidence = entry['confidence']
-            
             emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-            if emotion not in emotion_confidences:
-                emotion_confidences[emotion] = []
-            emotion_confidences[emotion].append(confidence)
+            confidence_totals[emotion] = confidence_totals.get(emotion, 0) + entry['confidence']
+            
+            if previous_emotion != emotion:
+                if previous_emotion is not None:
+                    emotion_transitions.append({
+                        "from": previous_emotion,
+                        "to": emotion,
+                        "timestamp": entry['timestamp']
+                    })
+                previous_emotion = emotion
         
         most_frequent = max(emotion_counts.items(), key=lambda x: x[1]) if emotion_counts else ("neutral", 0)
         
-        avg_confidences = {}
-        for emotion, confs in emotion_confidences.items():
-            avg_confidences[emotion] = round(sum(confs) / len(confs), 3)
-        
         total_entries = len(timeline)
+        avg_confidences = {}
         emotion_percentages = {}
         for emotion, count in emotion_counts.items():
+            avg_confidences[emotion] = round(confidence_totals[emotion] / count, 3)
             emotion_percentages[emotion] = round((count / total_entries) * 100, 1)
         
-        emotion_transitions = []
-        previous_emotion = None
-        for entry in timeline:
-            if previous_emotion != entry['emotion']:
-                if previous_emotion is not None:
-                    emotion_transitions.append({
-                        "from": previous_emotion,
-                        "to": entry['emotion'],
-                        "timestamp": entry['timestamp']
-                    })
-                previous_emotion = entry['emotion']
-        
         stability_score = 1.0 - (len(emotion_transitions) / max(1, len(timeline)))
         dominant_emotion = most_frequent[0] if most_frequent[1] / total_entries > 0.5 else "mixed"
         
@@ -324,7 +436,7 @@ class VideoEmotionDetector:
             "total_frames_analyzed": len(timeline),
             "duration": round(duration, 2),
             "processing_time": round(processing_time, 2),
-            "model_used": "dima806/facial_emotions_image_detection" if self.use_hf_model else "mediapipe_approximation",
+            "model_used": FACIAL_EMOTION_MODEL if self.use_hf_model else "mediapipe_approximation",
             "summary": {
                 "most_frequent_emotion": most_frequent[0],
                 "emotion_distribution": emotion_percentages,